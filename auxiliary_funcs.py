@@ -46,3 +46,73 @@ def R_ind(R, L, N, omega, n_e, n_g, K_el):
     b = 1j * k_p * R * jv(1, k_p * R) / (ep * jv(0, k_p * R))
 
     return a * np.real(b)
+
+
+def rate_constant(T_k, E, cs, m):
+    """Calculates a reaction rate constant for each temperature by integrating the cross-section over a maxwellian distribution.
+    T_k : array of temperatures in Kelvin
+    E : energies of the cross-section in eV
+    cs : cross-section values in m^2
+    m : mass of the incident particle"""
+    return rate_constants(T_k, [(E, cs)], m)[0]
+
+def rate_constants(T_k, cross_sections, m):
+    """Calculates the rate constants of several reactions at once : the cross-sections are interpolated on a common
+    energy grid so that the maxwellian weights are computed only once for all of them.
+    T_k : array of temperatures in Kelvin
+    cross_sections : list of (E, cs) couples as returned by load_cross_section (cross-sections are 0 outside of E)
+    m : mass of the incident particle
+    Returns an array of shape (nb_of_cross_sections, n_temperature)"""
+    # the points just outside each cross-section's range keep its edges sharp on the common grid
+    # (otherwise the trapezoid rule ramps it down to 0 up to the next point of another cross-section)
+    E = np.unique(np.concatenate([np.concatenate(([np.nextafter(E_r[0], -np.inf)], E_r, [np.nextafter(E_r[-1], np.inf)]))
+                                  for E_r, cs_r in cross_sections]))
+    E = E[E >= 0]
+    cs = np.array([np.interp(E, E_r, cs_r, left=0., right=0.) for E_r, cs_r in cross_sections])
+
+    T = T_k * k / e
+    v = np.sqrt(2 * E * e / m)  # electrons average speed
+    a = (m / (2 * pi * e * T))**(3/2) * 4 * pi
+
+    # trapezoid rule weights, so that integrating every cross-section is a single matrix product
+    dv = np.diff(v)
+    q = np.zeros(v.shape[0])
+    q[:-1] += dv / 2
+    q[1:] += dv / 2
+
+    # maxwellian weights exp(- m v^2 / (2 e T)) * v^3 * dv, shape (n_temperature, n_v)
+    w = np.empty((T.shape[0], v.shape[0]))
+    np.multiply.outer(1 / T, - m * v**2 / (2 * e), out=w)
+    np.exp(w, out=w)
+    w *= v**3 * q
+
+    return a * (cs @ w.T)
+
+
+class TabulatedRate:
+    """Rate constant tabulated over the electron temperature and evaluated by linear interpolation.
+    T : sorted array of temperatures in Kelvin
+    k_rate : rate constant for each temperature of T (e.g. computed with rate_constant)
+    When T is evenly spaced (e.g. np.linspace) scalar temperatures are looked up arithmetically, without binary search.
+    Outside of T, the first or last value of k_rate is returned."""
+
+    def __init__(self, T, k_rate, name="TabulatedRate"):
+        self.T = np.ascontiguousarray(T, dtype=np.float64)
+        self.k_rate = np.ascontiguousarray(k_rate, dtype=np.float64)
+        self.__name__ = name
+
+        n = self.T.shape[0]
+        self._T0 = self.T[0]
+        self._invdT = (n - 1) / (self.T[-1] - self.T[0])
+        self._uniform = np.allclose(np.diff(self.T), 1 / self._invdT, rtol=1e-6, atol=0)
+        self._i_max = n - 2
+        # slope of each segment (per grid step), so that a lookup costs one multiplication
+        self._dk = np.diff(self.k_rate)
+
+    def __call__(self, T_e):
+        if self._uniform and isinstance(T_e, float) and T_e == T_e:  # NaN goes through np.interp, which returns NaN
+            # clamped to the grid, like np.interp : end values are returned outside of it
+            x = min(max((T_e - self._T0) * self._invdT, 0.), self._i_max + 1.)
+            i = min(int(x), self._i_max)
+            return self.k_rate[i] + (x - i) * self._dk[i]
+        return np.interp(T_e, self.T, self.k_rate)
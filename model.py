@@ -1,8 +1,11 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np 
 from numpy.typing import NDArray
 from scipy.constants import m_e, e, pi, k, epsilon_0 as eps_0, mu_0   # k is k_B -> Boltzmann constant
-from scipy.integrate import trapezoid, solve_ivp, odeint
-from scipy.interpolate import interp1d
+from scipy.integrate import odeint, ode
+from scipy.optimize import OptimizeResult
+from scipy.linalg import block_diag
 
 #Local modules
 from util import load_csv, load_cross_section
@@ -10,6 +13,11 @@ from auxiliary_funcs import pressure, maxwellian_flux_speed, u_B, A_eff, A_eff_1
 from specie import Specie, Species
 from reaction import Reaction
 
+# LSODA tolerances of the runs to steady state (solve with final_only=True) :
+# STEADY_ATOL is also the absolute floor of the steady state check
+STEADY_RTOL = 1e-4
+STEADY_ATOL = 1e-8
+
 class GlobalModel:
 
     def __init__(self, config_dict: dict[str, float], species: Species, reaction_set: list[Reaction]):
@@ -33,13 +41,11 @@ class GlobalModel:
     #     e_iz, cs_iz  = load_cross_section('cross-sections/Xe/Ionization_Xe.csv')
 
     #     T = np.linspace(0.1 * e / k, 100 * e / k, 5000)  # Probably electron temperature : gaz T° is neglected in all likelyhood
-    #     k_el_array = self.rate_constant(T, e_el, cs_el, m_e)
-    #     k_ex_array = self.rate_constant(T, e_ex, cs_ex, m_e)
-    #     k_iz_array = self.rate_constant(T, e_iz, cs_iz, m_e)
+    #     k_el_array, k_ex_array, k_iz_array = rate_constants(T, [(e_el, cs_el), (e_ex, cs_ex), (e_iz, cs_iz)], m_e)
 
-    #     self.K_el = interp1d(T, k_el_array, fill_value=(k_el_array[0], k_el_array[-1]), bounds_error=True)
-    #     self.K_ex = interp1d(T, k_ex_array, fill_value=(k_ex_array[0], k_ex_array[-1]), bounds_error=True)
-    #     self.K_iz = interp1d(T, k_iz_array, fill_value=(k_iz_array[0], k_iz_array[-1]), bounds_error=True)
+    #     self.K_el = TabulatedRate(T, k_el_array, 'K_el')
+    #     self.K_ex = TabulatedRate(T, k_ex_array, 'K_ex')
+    #     self.K_iz = TabulatedRate(T, k_iz_array, 'K_iz')
         
     #     self.E_iz = 12.127 * e    # In Volt in Chabert paper, here in Joule
     #     self.E_ex = 11.6 * e
@@ -59,18 +65,6 @@ class GlobalModel:
     #     return 0.5 * (K_iz_1 + K_iz_2)
     # ^^^^
 
-    # def rate_constant(self, T_k, E, cs, m):
-    #     """Calculates a reaction rate constant """
-    #     T = T_k * k / e
-    #     n_temperature = T.shape[0]
-    #     v = np.sqrt(2 * E * e / m)  # electrons average speed
-    #     k_rate = np.zeros(n_temperature)
-    #     for i in np.arange(n_temperature):
-    #         a = (m / (2 * pi * e * T[i]))**(3/2) * 4 * pi
-    #         f = cs * v**3 * np.exp(- m * v**2 / (2 * e * T[i])) 
-    #         k_rate[i] = trapezoid(a*f, x=v)
-    #     return k_rate
-
     def load_config(self, config_dict: dict[str, float]):
 
         # Geometry
@@ -87,6 +81,13 @@ class GlobalModel:
         self.beta_i = config_dict['beta_i'] # Transparency to ions (!!! no exact formula => to be determined later on...)
         self.V_grid = config_dict['V_grid'] # potential difference
 
+        # Derived quantities, constant during the simulation
+        self.A_g = self.beta_g * pi * self.R**2
+        self.A_i = self.beta_i * pi * self.R**2
+        self.V = pi * self.R**2 * self.L
+        self.A = 2*pi*self.R**2 + 2*pi*self.R*self.L
+        self.v_beam = np.sqrt(2 * e * self.V_grid / self.m_i) # Ion beam's exit speed
+
         # Electrical
         self.omega = config_dict['omega']  # Pulsation of electro-mag fiel ?
         self.N = config_dict['N']  # Number of spires
@@ -101,23 +102,6 @@ class GlobalModel:
         self.n_g_0 = pressure(self.T_g_0, self.Q_g,     
                               maxwellian_flux_speed(self.T_g_0, self.m_i),
                               self.A_g) / (k * self.T_g_0)
-    
-    @property
-    def A_g(self): return self.beta_g * pi * self.R**2
-
-    @property
-    def A_i(self): return self.beta_i * pi * self.R**2
-
-    @property
-    def V(self): return pi * self.R**2 * self.L 
-
-    @property
-    def A(self): return 2*pi*self.R**2 + 2*pi*self.R*self.L
-
-    @property
-    def v_beam(self): 
-        """Ion beam's exit speed"""
-        return np.sqrt(2 * e * self.V_grid / self.m_i)
 
     def flux_i(self, T_e, T_g, n_e, n_g):
         """Ion flux leaving the thruster through the grid holes"""
@@ -133,11 +117,9 @@ class GlobalModel:
 
     def eval_property(self, func, sol):
         """Calculates a property based on 'state' for all 't'.
-            sol must be a np.array with shape (nb_of_t's, dimension_of_state) where each line represents a state"""
-        prop = np.zeros(sol.shape[0])   #number of instants
-        for i in np.arange(sol.shape[0]):
-            prop[i] = func(sol[i])
-        return prop
+            sol must be a np.array with shape (nb_of_t's, dimension_of_state) where each line represents a state.
+            func is called once with one array per state variable (e.g. thrust_i(T_e, T_g, n_e, n_g)), so it must accept arrays"""
+        return func(*sol.T)
 
     def P_loss(self, T_e, T_g, n_e, n_g):
         # Old code :
@@ -155,23 +137,18 @@ class GlobalModel:
         - Pertes aux parois
         - Dissociation et excitation vibrationnelle (plasma d'air)
         """
-        # Ionisation et excitation
-        a = self.E_iz * n_e * n_g * self.K_iz(T_e)
-        b = self.E_ex * n_e * n_g * self.K_ex(T_e)
-        
-        # Collisions élastiques (énergie transférée au gaz)
-        c = 3 * (m_e / self.m_i) * k * (T_e - T_g) * n_e * n_g * self.K_el(T_e)
+        # Ionisation, excitation, collisions élastiques (énergie transférée au gaz),
+        # dissociation et excitation vibrationnelle : tous proportionnels à n_e * n_g
+        rate_loss = (self.E_iz * self.K_iz(T_e)
+                     + self.E_ex * self.K_ex(T_e)
+                     + 3 * (m_e / self.m_i) * k * (T_e - T_g) * self.K_el(T_e)
+                     + self.E_diss * self.K_diss(T_e)
+                     + self.E_vibr * self.K_vibr(T_e))
 
         # Pertes aux parois
-        d = 7 * k * T_e * n_e * u_B(T_e, self.m_i) * A_eff(n_g, self.R, self.L) / self.V
-
-        # Dissociation et excitation vibrationnelle 
-        K_diss = self.K_diss(T_e)  # Taux de dissociation
+        wall = 7 * k * T_e * n_e * u_B(T_e, self.m_i) * A_eff(n_g, self.R, self.L) / self.V
 
-        e = self.E_diss * n_e * n_g * K_diss
-        f = E_vibr * n_e * n_g * K_vibr
-
-        return a + b + c + d + e + f
+        return n_e * n_g * rate_loss + wall
 
 
     
@@ -185,38 +162,25 @@ class GlobalModel:
         return power_balance
 
 
-def gas_heating(self, T_e, T_g, n_e, n_g):
-    """
-    Calcule la dérivée de l'énergie du gaz : (3/2) * n_g * k_B * T_g
-    pour un plasma d'air atmosphérique.
-    """
-
-    # Taux de réaction
-    K_diss = self.K_diss(T_e)  # Taux de dissociation
-    K_vibr = self.K_vibr(T_e)  # Taux d'excitation vibrationnelle
-    K_rot = self.K_rot(T_e)  # Taux d'excitation rotationnelle
-
-    # Collisions élastiques : transfert d'énergie des électrons vers le gaz
-    a = 3 * (m_e / self.m_i) * k * (T_e - T_g) * n_e * n_g * self.K_el(T_e)
-
-    # Transfert d'énergie des ions au gaz neutre via collisions
-    b = (1/4) * self.m_i * (u_B(T_e, self.m_i)**2) * n_e * n_g * SIGMA_I * maxwellian_flux_speed(T_g, self.m_i)
-
-    # Dissociation des molécules 
-    c = E_diss * n_e * n_g * K_diss
-
-    # Excitation vibrationnelle 
-    d = E_vibr * n_e * n_g * K_vibr
+    def gas_heating(self, T_e, T_g, n_e, n_g):
+        """
+        Calcule la dérivée de l'énergie du gaz : (3/2) * n_g * k_B * T_g
+        pour un plasma d'air atmosphérique.
+        """
 
-    # Excitation rotationnelle 
-    e = E_rot * n_e * n_g * K_rot
+        # Collisions élastiques (transfert d'énergie des électrons vers le gaz), transfert d'énergie des ions
+        # au gaz neutre via collisions, dissociation, excitation vibrationnelle et rotationnelle : tous proportionnels à n_e * n_g
+        rate_heating = (3 * (m_e / self.m_i) * k * (T_e - T_g) * self.K_el(T_e)
+                        + (1/4) * self.m_i * (u_B(T_e, self.m_i)**2) * SIGMA_I * maxwellian_flux_speed(T_g, self.m_i)
+                        + self.E_diss * self.K_diss(T_e)
+                        + self.E_vibr * self.K_vibr(T_e)
+                        + self.E_rot * self.K_rot(T_e))
 
-    # Transfert de chaleur aux parois : calcul de lamda0 ? 
-    lambda_0 = self.R / 2.405 + self.L / pi  # Longueur de diffusion thermique
-    f = self.kappa * (T_g - self.T_g_0) * self.A / (self.V * lambda_0)
+        # Transfert de chaleur aux parois : calcul de lamda0 ? 
+        lambda_0 = self.R / 2.405 + self.L / pi  # Longueur de diffusion thermique
+        wall = self.kappa * (T_g - self.T_g_0) * self.A / (self.V * lambda_0)
 
-    # Somme des contributions
-    return a + b + c + d + e - f
+        return n_e * n_g * rate_heating - wall
 
     # Ancient code :
     # def gas_heating(self, T_e, T_g, n_e, n_g):
@@ -253,13 +217,21 @@ def gas_heating(self, T_e, T_g, n_e, n_g):
     #     d = (1/4) * n_g * maxwellian_flux_speed(T_g, self.m_i) * self.A_g / self.V
     #     return a + b - c - d
 
-    def particle_balance(self, state: NDArray[float]): # type: ignore
+    def reaction_rate_constants(self, state: NDArray[float]): # type: ignore
+        """Evaluates once the rate constant of every reaction of reaction_set at this state"""
+        temperatures = state[self.species.nb:]
+        return [reac.rate_constant(temperatures) for reac in self.reaction_set]
+
+    def particle_balance(self, state: NDArray[float], K: list[float] | None = None): # type: ignore
         """Takes the state as input and returns derivative of all particle densities
             Input :
-            state : describes state. Has format [n_e, n_N2, ..., n_N+, T_e, T_monoato, ..., T_diato] """
-        dn = np.zeros(self.species.nb)
-        for reac in self.reaction_set:
-            dn += reac.density_change_rate(state)
+            state : describes state. Has format [n_e, n_N2, ..., n_N+, T_e, T_monoato, ..., T_diato]
+            K : rate constants of reaction_set at this state (see reaction_rate_constants), evaluated if not given """
+        if K is None:
+            K = self.reaction_rate_constants(state)
+        dn = np.zeros((self.species.nb,) + state.shape[1:])
+        for reac, K_r in zip(self.reaction_set, K):
+            dn += reac.density_change_rate(state, K_r)
         # dn[2] = inflow_of_N2 ...
         return dn
     
@@ -268,50 +240,147 @@ def gas_heating(self, T_e, T_g, n_e, n_g):
             Input :
             state : describes state. Has format [n_e, n_N2, ..., n_N+, T_e, T_monoato, ..., T_diato] """
         nb_e = state.shape[0] - self.species.nb
-        dE = np.zeros(nb_e) 
+        dE = np.zeros((nb_e,) + state.shape[1:]) 
         #pass
         return dE    
 
 
-    def P_rf(self, state: NDArray[float]): # type: ignore
-        """Calculates the power delivered by the coil using RF"""
+    def P_rf(self, state: NDArray[float], I_coil=None): # type: ignore
+        """Calculates the power delivered by the coil using RF.
+            state may also have shape (dimension_of_state, nb_of_states) with I_coil an array of nb_of_states intensities.
+            I_coil defaults to self.I_coil"""
         # ! To adapt to new var state
+        if I_coil is None:
+            I_coil = self.I_coil
         T_e, T_g, n_e, n_g = state
         R_ind_val = R_ind(self.R, self.L, self.N, self.omega, n_e, n_g, self.K_el(T_e))
-        return (1/2) * (R_ind_val + self.R_coil) * self.I_coil**2
+        return (1/2) * (R_ind_val + self.R_coil) * I_coil**2
 
     def f_dy(self, t, state):
         """Returns the derivative of the vector y describing the state of plasma.
             y has format : [n_e, n_N2, ..., n_N+, T_e, T_monoato, ..., T_diato]"""
         dy = np.zeros(state.shape)
+        K = self.reaction_rate_constants(state)  # shared by all balances
 
-        dy[:self.species.nb] = self.particle_balance(state)
+        dy[:self.species.nb] = self.particle_balance(state, K)
         dy[self.species.nb :] = self.energy_balance(state)
 
         return dy
+
+    def jac(self, t, state):
+        """Returns the jacobian of f_dy with regard to the state, shape (dimension_of_state, dimension_of_state)"""
+        J = np.zeros((state.shape[0], state.shape[0]))
+        for reac in self.reaction_set:
+            J[:self.species.nb] += reac.density_change_rate_jacobian(state)
+        # energy_balance does not depend on the state yet : its rows stay at 0
+        return J
     
 
-    def solve(self, t0, tf):
+    def solve(self, t0, tf, nb_t=1000, final_only=False, steady_tol=None):
+        """Integrates the state from t0 to tf with LSODA (odeint), evaluated at nb_t evenly spaced instants.
+            Returns an object with attributes t (shape (nb_t,)) and y (shape (dimension_of_state, nb_t)), like solve_ivp.
+            RuntimeError is raised if LSODA fails, e.g. when reaching its maximum number of steps.
+            With final_only=True, only the final state is computed and returned, without storing the trajectory.
+            Looser tolerances are then used since it is meant to reach a steady state (STEADY_RTOL, STEADY_ATOL), and if
+            steady_tol is given the integration stops early at the first of the nb_t instants t (nb_t >= 2) where every
+            variable y_i satisfies |dy_i/dt| * (tf - t) <= steady_tol * |y_i| + STEADY_ATOL (i.e. it would barely change
+            until tf) : the state returned is then the one at that instant, which may be before tf"""
         y0 = np.array([self.T_e_0, self.T_g_0, self.n_e_0, self.n_g_0])
-        return solve_ivp(self.f_dy, (t0, tf), y0, method='LSODA')
-
-
-    def solve_for_I_coil(self, I_coil):
+        if final_only:
+            return self.integrate_final_state(self.f_dy, self.jac, y0, t0, tf, nb_t, steady_tol)
+        t = np.linspace(t0, tf, nb_t)
+        y, info = odeint(self.f_dy, y0, t, Dfun=self.jac, rtol=1e-6, atol=1e-9, mxstep=10**6, tfirst=True, full_output=True)
+        if info['message'] != "Integration successful.":
+            raise RuntimeError(f"LSODA failed at t = {info['tcur'][-1]} : {info['message']}")
+        return OptimizeResult(t=t, y=y.T)
+
+    @staticmethod
+    def integrate_final_state(f_dy, jac, y0, t0, tf, nb_t=1000, steady_tol=None):
+        """Integrates y0 from t0 to tf with LSODA (scipy.integrate.ode) and only returns the final state (see solve, final_only=True).
+            RuntimeError is raised if LSODA fails, e.g. when reaching its maximum number of steps"""
+        r = ode(f_dy, jac).set_integrator('lsoda', rtol=STEADY_RTOL, atol=STEADY_ATOL, first_step=1e-9, max_step=1e-4, nsteps=10**6)
+        r.set_initial_value(y0, t0)
+        if steady_tol is None:
+            y = r.integrate(tf)
+            if not r.successful():
+                raise RuntimeError(f"LSODA failed at t = {r.t} (return code {r.get_return_code()})")
+            return y
+        if nb_t < 2:
+            raise ValueError(f"nb_t must be at least 2 to check for a steady state, got {nb_t}")
+        for t in np.linspace(t0, tf, nb_t)[1:]:
+            y = r.integrate(t)
+            if not r.successful():
+                raise RuntimeError(f"LSODA failed at t = {r.t} (return code {r.get_return_code()})")
+            if np.all(np.abs(f_dy(t, y)) * (tf - t) <= steady_tol * np.abs(y) + STEADY_ATOL):
+                break
+        return y
+
+    def f_dy_batch(self, t, Y, nb_states):
+        """Derivative of Y, the concatenation of nb_states states (block diagonal system).
+            The derivatives of all the states are computed at once, one column per state"""
+        return self.f_dy(t, Y.reshape(nb_states, -1).T).T.ravel()
+
+    def jac_batch(self, t, Y, nb_states):
+        """Jacobian of f_dy_batch : block diagonal, one block per state"""
+        return block_diag(*[self.jac(t, state) for state in Y.reshape(nb_states, -1)])
+
+    def solve_batch(self, t0, tf, I_coil, nb_t=1000, steady_tol=None):
+        """Integrates the states for all intensities of I_coil together, as one block diagonal system, so that the solver
+            is set up only once. Same integration and steady state stop as solve with final_only=True, the system being
+            steady when all the states are. Every rate_constant must then accept temperatures of shape
+            (nb_of_temperatures, nb_of_I_coil), one column per state.
+            I_coil only sets the number of states for now, since the derivative does not depend on it yet.
+            RuntimeError is raised if LSODA fails.
+            Returns the final states, shape (nb_of_I_coil, dimension_of_state)"""
+        nb_I = I_coil.shape[0]
+        y0 = np.tile([self.T_e_0, self.T_g_0, self.n_e_0, self.n_g_0], nb_I)
+        Y = self.integrate_final_state(lambda t, Y: self.f_dy_batch(t, Y, nb_I), lambda t, Y: self.jac_batch(t, Y, nb_I),
+                                       y0, t0, tf, nb_t, steady_tol)
+        return Y.reshape(nb_I, -1)
+
+
+    def solve_for_one_I_coil(self, I_coil):
+        """Solves until steady state for one intensity in the coil. self.I_coil is left unchanged.
+            ## Returns
+            `state` after long time"""
+        I_coil_model = self.I_coil
+        self.I_coil = I_coil
+        try:
+            return self.solve(0, 5e-2, final_only=True, steady_tol=1e-3)    # TODO Needs some testing
+        finally:
+            self.I_coil = I_coil_model
+
+    def solve_for_I_coil(self, I_coil, n_jobs=1, batch=False):
         """Calculates for a list of intensity in the coil the resulting power consumption and the resulting thrust.
+            Each intensity is independent : with n_jobs > 1 they are solved in parallel processes, each working on its own
+            copy of the model. n_jobs=None or -1 uses all cores, -2 all cores but one, etc. The model is then pickled :
+            the rate_constant of every reaction must be picklable (module level functions, not lambdas or local functions).
+            self.I_coil is left unchanged.
+            With batch=True they are all integrated at once as a single system (see solve_batch) and n_jobs is ignored.
+            Its jacobian is a dense block diagonal matrix of size (4 * nb_of_I_coil)^2, which LSODA factorizes at a cost
+            in O(nb_of_I_coil^3) : only worth it for short sweeps.
             ## Returns
             power_array , list_of(`state` after long time)"""
-        p = np.zeros(I_coil.shape[0])
-        solution = np.zeros((I_coil.shape[0], 4))  #shape = (y,x)
-
-        for i, I in enumerate(I_coil):
-            self.I_coil = I
-
-            sol = self.solve(0, 5e-2)    # TODO Needs some testing
-
-            final_state = sol.y[:, -1]
-
-            p[i] = self.P_rf(final_state)
-
-            solution[i] = final_state
-            
-        return p, solution
+        if batch:
+            results = self.solve_batch(0, 5e-2, I_coil, steady_tol=1e-3)
+        elif n_jobs == 1:
+            results = map(self.solve_for_one_I_coil, I_coil)
+        else:
+            nb_cpu = os.cpu_count() or 1
+            if n_jobs is None:
+                n_jobs = nb_cpu
+            elif n_jobs < 0:
+                n_jobs = max(nb_cpu + 1 + n_jobs, 1)
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                # one chunk per worker : each task is sent along with a pickled copy of the model
+                chunksize = max(1, I_coil.shape[0] // n_jobs)
+                results = list(executor.map(self.solve_for_one_I_coil, I_coil, chunksize=chunksize))
+
+        # one contiguous row per state variable, so that the power is computed for the whole sweep at once
+        final_states = np.empty((4, I_coil.shape[0]))
+        for i, final_state in enumerate(results):
+            final_states[:, i] = final_state
+
+        p = self.P_rf(final_states, I_coil)
+
+        return p, final_states.T
@@ -49,22 +49,46 @@ class Reaction:
         self.energy_threshold = energy_treshold
         self.rate_constant = rate_constant     # func
         self.spectators = spectators
+
+        # precomputed once so that density_change_rate, called at each step of the solver, only does array operations
+        self._reactives_indices = np.array(self.reactives_indices)
+        self._rate_coeffs = np.zeros(self.species.nb)
+        self._rate_coeffs[self.reactives_indices] = - self.stoechio_coeffs[self.reactives_indices]
+        self._rate_coeffs[self.products_indices] = self.stoechio_coeffs[self.products_indices]
         
 
-    def density_change_rate(self, state: NDArray[float]): # type: ignore
+    def density_change_rate(self, state: NDArray[float], K: float | None = None): # type: ignore
         """Returns an np.array with the change rate for each species due to this reaction
+        state has format : [n_e, n_N2, ..., n_N+, T_e, T_monoato, ..., T_diato]
+        It may also have shape (dimension_of_state, nb_of_states), one state per column (the result then has one column per state)
+        K : rate constant at this state, evaluated from state if not given"""
+        if K is None:
+            K = self.rate_constant(state[self.species.nb:])
+        product = K * np.prod(state[self._reactives_indices], axis=0) # product of rate constant and densities of all the stuff
+        return np.multiply.outer(self._rate_coeffs, product)
+
+    def density_change_rate_jacobian(self, state: NDArray[float]): # type: ignore
+        """Returns the jacobian of density_change_rate with regard to the state, shape (nb_of_species, dimension_of_state).
+        Derivatives with regard to densities are exact (mass action law), derivatives with regard to temperatures
+        are computed by finite differences on the rate constant only.
         state has format : [n_e, n_N2, ..., n_N+, T_e, T_monoato, ..., T_diato]"""
-        K = self.rate_constant(state[self.species.nb:])
-        product = K * np.prod(state[self.reactives_indices]) # product of rate constant and densities of all the stuff
-        rate = np.zeros(self.species.nb)
-        for sp in self.reactives:
-            i = self.species.get_index_by_instance(sp)
-            rate[i] = - product * self.stoechio_coeffs[i]
-        for sp in self.products:
-            i = self.species.get_index_by_instance(sp)
-            rate[i] = + product * self.stoechio_coeffs[i]
-        
-        return rate
+        nb = self.species.nb
+        temperatures = state[nb:]
+        K = self.rate_constant(temperatures)
+        densities = state[self._reactives_indices]
+
+        d_product = np.zeros(state.shape[0])
+        # d/dn_j of the product of densities : product of all the other reactives (repeated reactives are summed)
+        for p, i in enumerate(self.reactives_indices):
+            d_product[i] += K * np.prod(np.delete(densities, p))
+        prod_densities = np.prod(densities)
+        for j in range(temperatures.shape[0]):
+            dT = 1e-6 * max(abs(temperatures[j]), 1.)
+            shifted = temperatures.copy()
+            shifted[j] += dT
+            d_product[nb + j] = (self.rate_constant(shifted) - K) / dT * prod_densities
+
+        return np.outer(self._rate_coeffs, d_product)
 
 
     def electron_energy_change_rate(self, state: NDArray[float]): # type: ignore
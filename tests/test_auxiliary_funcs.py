@@ -0,0 +1,66 @@
+import numpy as np
+from scipy.constants import e, k, m_e
+
+from ..auxiliary_funcs import rate_constant, rate_constants, maxwellian_flux_speed, TabulatedRate
+
+
+def test_rate_constant_constant_cross_section():
+    # for a constant cross-section, K = sigma * <v> (mean maxwellian speed)
+    T = np.linspace(1 * e / k, 10 * e / k, 20)
+    E = np.linspace(0, 500, 200000)
+    sigma = 1e-19
+    K = rate_constant(T, E, sigma * np.ones_like(E), m_e)
+    assert np.allclose(K, sigma * maxwellian_flux_speed(T, m_e), rtol=1e-4, atol=0)
+
+
+def test_rate_constants_matches_rate_constant():
+    T = np.linspace(1 * e / k, 10 * e / k, 20)
+    E = np.linspace(0, 100, 2000)
+    cs_1 = 1e-20 * np.ones_like(E)
+    cs_2 = 1e-20 * np.clip(E - 12, 0, None)
+    K = rate_constants(T, [(E, cs_1), (E, cs_2)], m_e)
+    assert K.shape == (2, 20)
+    assert np.allclose(K[0], rate_constant(T, E, cs_1, m_e), atol=0)
+    assert np.allclose(K[1], rate_constant(T, E, cs_2, m_e), atol=0)
+
+
+def test_rate_constants_different_grids():
+    # cross-sections are 0 outside of their own grid : no extra area at their edges on the common grid
+    T = np.linspace(1 * e / k, 10 * e / k, 20)
+    E_coarse = np.linspace(0, 1000, 11)
+    for E in [np.linspace(0, 50, 2001), np.linspace(20, 50, 1201)]:
+        cs = 1e-20 * np.ones_like(E)
+        K = rate_constants(T, [(E, cs), (E_coarse, 1e-20 * np.ones_like(E_coarse))], m_e)
+        assert np.allclose(K[0], rate_constant(T, E, cs, m_e), rtol=1e-9, atol=0)
+
+
+def test_TabulatedRate_interpolation():
+    T = np.linspace(1e3, 1e5, 50)
+    K = TabulatedRate(T, T**2)
+    assert np.isclose(K(T[3]), T[3]**2)
+    assert np.isclose(K(0.5 * (T[3] + T[4])), 0.5 * (T[3]**2 + T[4]**2))
+
+
+def test_TabulatedRate_uniform_lookup_matches_interp():
+    T = np.linspace(1e3, 1e5, 50)
+    K = TabulatedRate(T, np.sqrt(T))
+    for T_e in np.linspace(1e3, 1e5, 37):
+        assert np.isclose(K(float(T_e)), np.interp(T_e, T, np.sqrt(T)))
+
+
+def test_TabulatedRate_clamped_outside_grid():
+    T = np.linspace(1e3, 1e5, 50)
+    K = TabulatedRate(T, np.sqrt(T))
+    assert np.isclose(K(10.), np.sqrt(T[0]))
+    assert np.isclose(K(1e6), np.sqrt(T[-1]))
+    assert np.allclose(K(np.array([10., 1e6])), np.sqrt(T[[0, -1]]))
+
+
+def test_TabulatedRate_non_finite_temperatures():
+    T = np.linspace(1e3, 1e5, 50)
+    K = TabulatedRate(T, np.sqrt(T))
+    assert np.isnan(K(np.nan))
+    assert np.isnan(K(np.array([np.nan]))[0])
+    assert np.isclose(K(np.inf), np.sqrt(T[-1]))
+    assert np.isclose(K(-np.inf), np.sqrt(T[0]))
+    assert np.allclose(K(np.array([-np.inf, np.inf])), np.sqrt(T[[0, -1]]))
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from ..specie import Specie, Species
+from ..reaction import Reaction
+from ..model import GlobalModel
+from ..auxiliary_funcs import TabulatedRate
+from ..config import config_dict
+
+
+def K_forward(temperatures):
+    return 1e3
+
+
+def K_backward(temperatures):
+    return 2e3
+
+
+def test_solve_raises_when_lsoda_fails():
+    species = Species([Specie("A", 2.18e-25, 0), Specie("B", 2.18e-25, 0)])
+    model = GlobalModel.__new__(GlobalModel)
+    model.species = species
+    # dn_A/dt = K n_A^2 blows up in finite time (t = 1e-3 here)
+    model.reaction_set = [Reaction(species, ["A", "A"], ["A"], K_forward, 0, [1, 0])]
+    # solve still builds the initial state from the Xe attributes : [n_A, n_B, T_e, T_g] here
+    model.T_e_0, model.T_g_0, model.n_e_0, model.n_g_0 = 1., 0., 3e4, 300.
+    with pytest.raises(RuntimeError):
+        model.solve(0, 5.0, nb_t=5)
+
+
+def K_iz(temperatures):
+    return 1e-20 * np.sqrt(temperatures[0])
+
+
+def K_rec(temperatures):
+    return 1e-35 * (300 / temperatures[1])
+
+
+def make_model():
+    """GlobalModel with only the attributes needed by f_dy (load_chemistry is not available yet)"""
+    species = Species([Specie("e", 9.1e-31, -1), Specie("Xe", 2.18e-25, 0), Specie("Xe+", 2.18e-25, 1)])
+    model = GlobalModel.__new__(GlobalModel)
+    model.species = species
+    model.reaction_set = [Reaction(species, ["e", "Xe"], ["e", "Xe+"], K_iz, 12.13, [1, 1, 1]),
+                          Reaction(species, ["e", "Xe+", "Xe"], ["Xe", "Xe"], K_rec, 0, [1, 2, 1])]
+    return model
+
+
+def test_jac_matches_finite_differences():
+    model = make_model()
+    state = np.array([1e17, 1e19, 1e17, 3e4, 300.])
+    J = model.jac(0, state)
+    J_fd = np.zeros(J.shape)
+    for j in range(state.shape[0]):
+        shifted = state.copy()
+        shifted[j] *= 1 + 1e-7
+        J_fd[:, j] = (model.f_dy(0, shifted) - model.f_dy(0, state)) / (shifted[j] - state[j])
+    assert np.allclose(J, J_fd, rtol=1e-5, atol=0)
+
+
+def make_sweep_model():
+    """GlobalModel with the attributes needed by solve_for_I_coil, reactions A <-> B with picklable rate constants"""
+    species = Species([Specie("A", 2.18e-25, 0), Specie("B", 2.18e-25, 0)])
+    model = GlobalModel.__new__(GlobalModel)
+    model.load_config(config_dict)
+    model.K_el = TabulatedRate(np.linspace(1e2, 1e7, 100), 3e-13 * np.ones(100), 'K_el')
+    model.species = species
+    model.reaction_set = [Reaction(species, ["A"], ["B"], K_forward, 0, [1, 1]),
+                          Reaction(species, ["B"], ["A"], K_backward, 0, [1, 1])]
+    # solve still builds the initial state from the Xe attributes : [n_A, n_B, T_e, T_g] here
+    model.T_e_0, model.T_g_0, model.n_e_0, model.n_g_0 = 1e18, 2e18, 3e4, 300.
+    return model
+
+
+def test_solve_for_I_coil_parallel_matches_serial():
+    model = make_sweep_model()
+    I_coil = np.linspace(1, 40, 5)
+    p_serial, s_serial = model.solve_for_I_coil(I_coil)
+    for n_jobs in [2, -1]:
+        p_parallel, s_parallel = model.solve_for_I_coil(I_coil, n_jobs=n_jobs)
+        assert np.array_equal(s_parallel, s_serial)
+        assert np.array_equal(p_parallel, p_serial)
+    assert np.allclose(s_serial[:, :2], [2e18, 1e18], rtol=1e-2, atol=0)  # equilibrium A <-> B
+    assert model.I_coil == config_dict['I_coil']
+
+
+def test_solve_for_I_coil_batch_matches_serial():
+    model = make_sweep_model()
+    I_coil = np.linspace(1, 40, 4)
+    p_serial, s_serial = model.solve_for_I_coil(I_coil)
+    p_batch, s_batch = model.solve_for_I_coil(I_coil, batch=True)
+    assert np.allclose(s_batch, s_serial, rtol=1e-3, atol=0)
+    assert np.allclose(p_batch, p_serial, rtol=1e-3, atol=0)
+    assert model.I_coil == config_dict['I_coil']
+
+
+def test_batch_blocks_match_single_states():
+    model = make_model()
+    states = np.array([[1e17, 1e19, 1e17, 3e4, 300.],
+                       [2e16, 5e18, 3e15, 1e4, 500.],
+                       [4e17, 2e19, 9e16, 6e4, 250.]])
+    Y = states.ravel()
+    dY = model.f_dy_batch(0, Y, 3)
+    J = model.jac_batch(0, Y, 3)
+    for i, state in enumerate(states):
+        block = slice(5 * i, 5 * (i + 1))
+        assert np.allclose(dY[block], model.f_dy(0, state), rtol=1e-12, atol=0)
+        assert np.array_equal(J[block, block], model.jac(0, state))
+    assert np.count_nonzero(J) == sum(np.count_nonzero(model.jac(0, state)) for state in states)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from ..specie import Specie, Species
+from ..reaction import Reaction
+
+
+def K_test(temperatures):
+    return 1e-16 * np.sqrt(temperatures[0])
+
+
+def make_species():
+    return Species([Specie("e", 9.1e-31, -1), Specie("N2", 4.65e-26, 0), Specie("N", 2.33e-26, 0), Specie("N+", 2.33e-26, 1)])
+
+
+def density_change_rate_loop(reac, state):
+    """Reference implementation : loop over reactives and products"""
+    K = reac.rate_constant(state[reac.species.nb:])
+    product = K * np.prod(state[reac.reactives_indices])
+    rate = np.zeros(reac.species.nb)
+    for sp in reac.reactives:
+        i = reac.species.get_index_by_instance(sp)
+        rate[i] = - product * reac.stoechio_coeffs[i]
+    for sp in reac.products:
+        i = reac.species.get_index_by_instance(sp)
+        rate[i] = + product * reac.stoechio_coeffs[i]
+    return rate
+
+
+def test_density_change_rate_matches_loop():
+    species = make_species()
+    state = np.array([1e17, 1e19, 3e18, 1e17, 3e4, 300.])
+    reactions = [Reaction(species, ["e", "N2"], ["N", "N"], K_test, 9.8, [1, 1, 2, 0]),
+                 Reaction(species, ["e", "N"], ["e", "N+"], K_test, 14.5, [2, 0, 1, 1]),
+                 Reaction(species, ["N", "N", "N2"], ["N2", "N2"], K_test, 0, [0, 2, 2, 0])]
+    for reac in reactions:
+        assert np.allclose(reac.density_change_rate(state), density_change_rate_loop(reac, state), rtol=1e-12, atol=0)
+        assert np.allclose(reac.density_change_rate(state, K_test(state[4:])), density_change_rate_loop(reac, state), rtol=1e-12, atol=0)
+
+
+def test_density_change_rate_jacobian_matches_finite_differences():
+    species = make_species()
+    state = np.array([1e17, 1e19, 3e18, 1e17, 3e4, 300.])
+    reac = Reaction(species, ["N", "N", "N2"], ["N2"], K_test, 0, [0, 2, 2, 0])
+    J = reac.density_change_rate_jacobian(state)
+    J_fd = np.zeros(J.shape)
+    for j in range(state.shape[0]):
+        shifted = state.copy()
+        shifted[j] *= 1 + 1e-7
+        J_fd[:, j] = (reac.density_change_rate(shifted) - reac.density_change_rate(state)) / (shifted[j] - state[j])
+    assert np.allclose(J, J_fd, rtol=1e-5, atol=0)
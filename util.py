@@ -4,6 +4,7 @@ def load_csv(filename, sep=';', skiprows=0):
     return np.loadtxt(open(filename, "rb"), delimiter=sep, skiprows=skiprows)
 
 def load_cross_section(filename):
-    """Takes a text file with two columns of numbers and return two arrays : one for each column"""
+    """Takes a text file with two columns of numbers and return two arrays : one for each column.
+    The columns are copied into contiguous float64 arrays (slices of the loaded table are strided)"""
     data_cs = load_csv(filename)
-    return data_cs[:,0], data_cs[:,1]
\ No newline at end of file
+    return np.ascontiguousarray(data_cs[:,0], dtype=np.float64), np.ascontiguousarray(data_cs[:,1], dtype=np.float64)
\ No newline at end of file